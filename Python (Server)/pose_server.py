@@ -3,29 +3,80 @@
 Real-time MediaPipe Pose -> WebSocket broadcaster
 - Run inside your project's venv:
     pip install mediapipe opencv-python websockets
+- Optional, faster asyncio event loop (Linux/macOS only):
+    pip install uvloop
+- Optional, JIT-compiled per-frame kinematics:
+    pip install numba
 - Start:
     python pose_server.py
 - Connect a client to: ws://localhost:8765
 
+Wire format: one binary WebSocket message per broadcast, little-endian.
+Each frame is a POSE_HEADER (timestamp f64, image_w u32, image_h u32,
+mid_hip_z f32, torso_angle f32, fps f32, landmark_scale f32, count u16)
+followed by count * [x, y, z, visibility] int16, where value = q / landmark_scale.
+
 Controls:
 - Press 'q' in the camera window to stop and quit.
+- Ctrl+C (SIGINT) or SIGTERM also stops the server, with or without a window.
+
+Environment:
+- POSE_HEADLESS=1         run without the debug window (no drawing, no imshow)
+- POSE_DISPLAY_EVERY=N    refresh the debug window every Nth frame (default 2)
+- POSE_MODEL=0|1|2        MediaPipe model complexity (default 0, the Lite model)
+- POSE_PROCESS_WIDTH=N    downscale wider frames to N px before inference (default 640)
+- POSE_MOTION_THRESH=T    reuse the last pose while the scene changes less than T grey
+                          levels per pixel (default 1.5, 0 = run inference every frame)
+- POSE_CPU_AFFINITY=0,1   pin the inference thread to these cores (Linux only, default off)
+- OMP_NUM_THREADS=N       OpenMP threads for native libs (default 2)
+- POSE_OPENCL=1           run resize/flip/colour conversion through OpenCL (cv2.UMat)
+                          when a device is available (default off)
+- POSE_BATCH_FRAMES=K     a client that falls behind gets up to K queued frames
+                          back to back in one message (default 1 = newest frame only)
 """
 
+import math
+import os
+import signal
+import struct
+import sys
 import threading
 import time
-import json
 import asyncio
+from concurrent.futures import ThreadPoolExecutor
 from typing import Optional
 
+# Must be set before the native libraries spin up their thread pools
+os.environ.setdefault("OMP_NUM_THREADS", "2")
+
 try:
     import cv2
     import mediapipe as mp
+    import numpy as np
     import websockets
 except Exception as e:
     print("Missing dependency or import error:", e)
     print("Install required packages inside your venv:\n  pip install mediapipe opencv-python websockets")
     raise
 
+try:
+    import uvloop  # optional: libuv-based event loop, not available on Windows
+except ImportError:
+    uvloop = None
+
+# The per-frame OpenCV ops are small; a worker pool here only competes with MediaPipe
+cv2.setNumThreads(1)
+
+# Transparent API: with UMat inputs, OpenCV runs pixel ops on the OpenCL device
+USE_OPENCL = os.getenv("POSE_OPENCL", "").lower() not in ("", "0", "false", "no") and cv2.ocl.haveOpenCL()
+cv2.ocl.setUseOpenCL(USE_OPENCL)
+
+try:
+    from numba import njit  # optional: compiles the per-frame kinematics math
+except ImportError:
+    def njit(*args, **kwargs):
+        return lambda fn: fn
+
 # WebSocket server settings
 WS_HOST = "0.0.0.0"
 WS_PORT = 8765
@@ -35,82 +86,293 @@ mp_drawing = mp.solutions.drawing_utils
 
 TARGET_FPS = 30
 FRAME_DELAY = 1.0 / TARGET_FPS
+CAMERA_STOP_TIMEOUT = 2.0  # seconds to wait for the camera loop on shutdown
+MAX_STALE_GRABS = 4  # upper bound on buffered frames dropped per read
+
+# Landmarks go on the wire as int16 fixed point: value = q / LANDMARK_SCALE.
+# Covers +/-4.0 (off-screen x/y, depth z) at ~1.2e-4 resolution.
+LANDMARK_SCALE = 8192
+
+# Per-frame binary header, see "Wire format" above
+POSE_HEADER = struct.Struct("<dIIffffH")
+
+# MediaPipe cost is dominated by model choice and input size
+MODEL_COMPLEXITY = int(os.getenv("POSE_MODEL", "0"))
+PROCESS_WIDTH = int(os.getenv("POSE_PROCESS_WIDTH", "640"))
+
+# Motion gate: skip inference on near-static frames and reuse the previous results
+MOTION_THRESH = float(os.getenv("POSE_MOTION_THRESH", "1.5"))
+MOTION_SIZE = (64, 64)  # downsampled grayscale used for the frame diff
+MAX_SKIPPED_FRAMES = 5  # run inference at least every N+1 frames regardless
+
+# Optional core pinning for the inference thread (threads MediaPipe starts inherit it)
+CPU_AFFINITY = {int(c) for c in os.getenv("POSE_CPU_AFFINITY", "").split(",") if c.strip()}
+
+# Debug window: drawing + imshow run inline with capture, so keep them off the hot path
+HEADLESS = os.getenv("POSE_HEADLESS", "").lower() not in ("", "0", "false", "no")
+DISPLAY_EVERY = max(1, int(os.getenv("POSE_DISPLAY_EVERY", "2")))
 
 # Shared state
-CONNECTED = set()  # set of websocket connections
-
-
-def landmarks_to_normalized_list(landmarks):
-    out = []
-    for idx, lm in enumerate(landmarks):
-        out.append({
-            "id": idx,
-            "x": lm.x,  # normalized [0..1]
-            "y": lm.y,  # normalized [0..1]
-            "z": lm.z,  # relative depth in MP normalized coords
-            "visibility": getattr(lm, "visibility", None)
-        })
+CONNECTED = {}  # websocket connection -> its outgoing message queue
+BATCH_FRAMES = max(1, int(os.getenv("POSE_BATCH_FRAMES", "1")))
+CLIENT_QUEUE_SIZE = max(8, BATCH_FRAMES)  # frames buffered per client before the oldest is dropped
+NUM_LANDMARKS = 33
+
+
+def _landmark_wire_layout(n_fields):
+    """
+    Byte layout of one serialized NormalizedLandmark inside a NormalizedLandmarkList
+    when it sets float fields 1..n_fields (x, y, z, visibility[, presence]):
+    0x0a <len> then a (tag byte, float32 LE) pair per field.
+    Returns (record size, (tag columns, expected tag bytes, x/y/z/visibility byte columns)).
+    """
+    size = 2 + 5 * n_fields
+    tag_cols = [0, 1] + [2 + 5 * i for i in range(n_fields)]
+    tag_vals = [0x0A, size - 2] + [(i + 1) << 3 | 5 for i in range(n_fields)]
+    float_cols = [c for i in range(4) for c in range(3 + 5 * i, 7 + 5 * i)]
+    return size, (np.array(tag_cols), np.array(tag_vals, dtype=np.uint8), np.array(float_cols))
+
+
+_LANDMARK_WIRE_LAYOUTS = dict(_landmark_wire_layout(n) for n in (4, 5))
+
+
+def landmarks_to_array(landmark_list, out=None):
+    """Return a (N, 4) float32 array of [x, y, z, visibility] rows, written into `out` if given.
+
+    x/y are normalized [0..1], z is relative depth in MP normalized coords.
+    Decodes the protobuf's serialized bytes with numpy instead of touching 33 Python
+    landmark objects; falls back to the attribute loop if the layout isn't the expected one.
+    A fresh array is allocated if `out` is None or its shape doesn't match.
+    """
+    data = landmark_list.SerializeToString()
+    n = len(landmark_list.landmark)
+    if out is None or out.shape != (n, 4):
+        out = np.empty((n, 4), dtype=np.float32)
+    layout = _LANDMARK_WIRE_LAYOUTS.get(len(data) // n) if n and len(data) % n == 0 else None
+    if layout is not None:
+        tag_cols, tag_vals, float_cols = layout
+        raw = np.frombuffer(data, dtype=np.uint8).reshape(n, -1)
+        if (raw[:, tag_cols] == tag_vals).all():
+            # gather the float32 bytes straight into out's memory
+            raw.take(float_cols, axis=1, out=out.view(np.uint8))
+            return out
+    for i, lm in enumerate(landmark_list.landmark):
+        out[i, 0] = lm.x
+        out[i, 1] = lm.y
+        out[i, 2] = lm.z
+        out[i, 3] = lm.visibility
     return out
 
 
-def compute_mid_hip_z(landmarks):
+def quantize_landmarks(landmarks_arr):
+    """Encode landmarks as little-endian int16 fixed point (see LANDMARK_SCALE)."""
+    return np.clip(np.rint(landmarks_arr * LANDMARK_SCALE), -32768, 32767).astype("<i2").tobytes()
+
+
+def motion_signature(frame):
+    """Tiny grayscale thumbnail; mean abs difference between two of them approximates scene motion."""
+    small = cv2.resize(cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY), MOTION_SIZE, interpolation=cv2.INTER_AREA)
+    return small.get() if isinstance(small, cv2.UMat) else small
+
+
+@njit(cache=True, fastmath=True)
+def compute_kinematics(landmarks_arr):
+    """
+    Derived per-frame values from the (33, 4) landmark array:
+    - mid_hip_z: mean depth of the hips (23, 24)
+    - torso_angle: lean of the hip->shoulder midline from image vertical, in degrees
+      (0 = upright, positive = leaning towards +x)
+    """
+    hip_x = (landmarks_arr[23, 0] + landmarks_arr[24, 0]) * 0.5
+    hip_y = (landmarks_arr[23, 1] + landmarks_arr[24, 1]) * 0.5
+    mid_hip_z = (landmarks_arr[23, 2] + landmarks_arr[24, 2]) * 0.5
+    shoulder_x = (landmarks_arr[11, 0] + landmarks_arr[12, 0]) * 0.5
+    shoulder_y = (landmarks_arr[11, 1] + landmarks_arr[12, 1]) * 0.5
+    # image y grows downwards, so "up" is -y
+    torso_angle = math.degrees(math.atan2(shoulder_x - hip_x, hip_y - shoulder_y))
+    return mid_hip_z, torso_angle
+
+
+def grab_latest(cap, stale_frames: int = 0):
+    """
+    Drop `stale_frames` buffered frames with grab() (no decode), then grab and
+    decode the next one. The first frame out of the buffer is never assumed
+    stale: with a one-frame buffer it is the freshest frame available.
+    """
+    for _ in range(stale_frames):
+        if not cap.grab():
+            return False, None
+    if not cap.grab():
+        return False, None
+    return cap.retrieve()
+
+
+def pin_current_thread(cpus):
+    """Restrict the calling thread to `cpus`; no-op where sched_setaffinity is unavailable."""
     try:
-        return (landmarks[23].z + landmarks[24].z) / 2.0
-    except Exception:
-        return 0.0
+        cpus = cpus & os.sched_getaffinity(0)
+        if cpus:
+            os.sched_setaffinity(0, cpus)
+            print(f"[CAM] Pinned {threading.current_thread().name} to CPUs {sorted(cpus)}")
+    except (AttributeError, OSError):
+        pass
 
 
-def camera_worker(last_payload: dict, stop_event: threading.Event, camera_index: int = 0):
+def open_camera(camera_index: int):
     """
-    Runs in a background thread, updates last_payload in-place.
-    Shows a debug OpenCV window and sets stop_event when 'q' pressed.
+    Open and configure the capture device (called on the capture thread).
+    Returns (cap, drain, frame_period), or None on failure. drain is False when the
+    backend accepted a one-frame buffer, so nothing queued can ever be stale.
     """
     cap = cv2.VideoCapture(camera_index)
     if not cap.isOpened():
-        print(f"[CAM] ERROR: Could not open webcam (index {camera_index}).")
-        stop_event.set()
-        return
+        cap.release()
+        return None
+    # keep the driver queue short so frames aren't stale by the time we read them
+    drain = not (cap.set(cv2.CAP_PROP_BUFFERSIZE, 1) and cap.get(cv2.CAP_PROP_BUFFERSIZE) == 1)
+    cam_fps = cap.get(cv2.CAP_PROP_FPS)
+    frame_period = 1.0 / cam_fps if cam_fps > 0 else FRAME_DELAY
+    return cap, drain, frame_period
+
+
+def warm_up_kinematics():
+    """Compile (or load from cache) compute_kinematics before the first detected pose."""
+    compute_kinematics(np.zeros((NUM_LANDMARKS, 4), dtype=np.float32))
+
 
-    with mp_pose.Pose(
+def make_pose():
+    """Build the MediaPipe Pose solution (called on the inference thread)."""
+    return mp_pose.Pose(
         static_image_mode=False,
-        model_complexity=1,
+        model_complexity=MODEL_COMPLEXITY,
+        smooth_landmarks=True,
         enable_segmentation=False,
-        min_detection_confidence=0.5,
-        min_tracking_confidence=0.5
-    ) as pose:
-        print("[CAM] Camera worker started. Press 'q' in window to quit.")
-        prev = time.time()
-        try:
-            while not stop_event.is_set():
-                t0 = time.time()
-                ret, frame = cap.read()
-                if not ret:
-                    print("[CAM] Failed reading frame from webcam.")
-                    break
+        min_detection_confidence=0.4,
+        min_tracking_confidence=0.4
+    )
 
-                # Mirror for natural interaction
-                frame_rgb = cv2.cvtColor(cv2.flip(frame, 1), cv2.COLOR_BGR2RGB)
-                h, w, _ = frame_rgb.shape
 
-                results = pose.process(frame_rgb)
+def publish(message: bytes):
+    """Hand an encoded frame to every client's writer task."""
+    for queue in CONNECTED.values():
+        # a full queue means that client is lagging: drop its oldest frame
+        # rather than stall everyone else
+        if queue.full():
+            queue.get_nowait()
+        queue.put_nowait(message)
 
-                if results.pose_landmarks:
-                    lm_list = results.pose_landmarks.landmark
-                    mid_hip_z = compute_mid_hip_z(lm_list)
-                    normalized_landmarks = landmarks_to_normalized_list(lm_list)
-
-                    # update shared payload (simple atomic replace since same thread writes)
-                    last_payload["timestamp"] = time.time()
-                    last_payload["landmarks"] = normalized_landmarks
-                    last_payload["image_w"] = w
-                    last_payload["image_h"] = h
-                    last_payload["mid_hip_z"] = mid_hip_z
-                    last_payload["fps"] = 1.0 / max(1e-4, time.time() - prev)
-                else:
-                    last_payload["landmarks"] = None
 
-                # debug drawing & display (flip back)
-                debug_frame = cv2.flip(frame, 1)
+async def camera_loop(stop_event: asyncio.Event, camera_index: int = 0):
+    """
+    Capture -> pose -> publish, running on the event loop (main) thread.
+    The blocking calls are pushed onto single-thread executors: one for the camera
+    (every VideoCapture call, open to release, runs on that one thread) and one for MediaPipe, whose inference releases
+    the GIL, so clients keep being served while a frame is processed. Each result is
+    published as soon as it is encoded.
+    Unless HEADLESS, shows a debug OpenCV window from the main thread and sets
+    stop_event when 'q' pressed.
+    """
+    loop = asyncio.get_running_loop()
+    capture_pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix="capture")
+    # MediaPipe's own worker threads are started from this thread and inherit its pinning
+    inference_pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix="inference",
+                                        initializer=pin_current_thread if CPU_AFFINITY else None,
+                                        initargs=(CPU_AFFINITY,) if CPU_AFFINITY else ())
+    cap = None
+    pose = None
+    try:
+        opened = await loop.run_in_executor(capture_pool, open_camera, camera_index)
+        if opened is None:
+            print(f"[CAM] ERROR: Could not open webcam (index {camera_index}).")
+            return
+        cap, drain, frame_period = opened
+        backlog = 0.0
+
+        pose = await loop.run_in_executor(inference_pool, make_pose)
+        # an uncached JIT compile takes long enough to stall connecting clients
+        await loop.run_in_executor(inference_pool, warm_up_kinematics)
+
+        if HEADLESS:
+            print("[CAM] Camera loop started (headless). Press Ctrl+C to quit.")
+        else:
+            print("[CAM] Camera loop started. Press 'q' in window to quit.")
+        prev = time.perf_counter()
+        next_tick = prev + FRAME_DELAY
+        frame_id = 0
+        rgb_buf = None  # reused RGB frame for MediaPipe, allocated on first frame
+        lm_buf = np.empty((NUM_LANDMARKS, 4), dtype=np.float32)  # reused landmark decode target
+        last_results = None
+        ref_signature = None  # thumbnail of the last frame that actually ran inference
+        skipped = 0
+        while not stop_event.is_set():
+            # On backends that ignore the buffer size, drop only the frames that queued
+            # up beyond the newest one while this loop was busy; the fractional
+            # remainder carries over so a slow loop can't let the buffer fill.
+            stale = 0
+            if drain:
+                backlog = max(backlog + (time.perf_counter() - prev) / frame_period - 1, 0.0)
+                stale = min(int(backlog), MAX_STALE_GRABS)
+                backlog -= stale
+            ret, frame = await loop.run_in_executor(capture_pool, grab_latest, cap, stale)
+            if not ret:
+                print("[CAM] Failed reading frame from webcam.")
+                break
+            now = time.perf_counter()
+            fps = 1.0 / max(1e-4, now - prev)
+            prev = now
+
+            # Pixel ops below run on the OpenCL device when frame is a UMat;
+            # .get() copies results back only where numpy arrays are needed
+            h, w, _ = frame.shape
+            if USE_OPENCL:
+                frame = cv2.UMat(frame)
+
+            # Landmarks are normalized, so inference on a smaller frame gives the same coords;
+            # clients still get the camera's w/h, which is what they scale them by
+            if PROCESS_WIDTH > 0 and w > PROCESS_WIDTH:
+                proc_h = round(h * PROCESS_WIDTH / w)
+                frame = cv2.resize(frame, (PROCESS_WIDTH, proc_h), interpolation=cv2.INTER_AREA)
+
+            # Mirror for natural interaction; the mirrored BGR frame doubles as the debug view
+            frame_mirror = cv2.flip(frame, 1)
+
+            # Compare against the last processed frame (not the previous one) so slow
+            # drift still accumulates into a re-run; the payload is re-sent with a fresh
+            # timestamp either way, so clients keep seeing a live stream.
+            signature = motion_signature(frame) if MOTION_THRESH > 0 else None
+            if (signature is not None and last_results is not None
+                    and skipped < MAX_SKIPPED_FRAMES
+                    and cv2.absdiff(signature, ref_signature).mean() < MOTION_THRESH):
+                results = last_results
+                skipped += 1
+            else:
+                if USE_OPENCL:
+                    frame_rgb = cv2.cvtColor(frame_mirror, cv2.COLOR_BGR2RGB).get()
+                else:
+                    if rgb_buf is None or rgb_buf.shape != frame_mirror.shape:
+                        rgb_buf = np.empty_like(frame_mirror)
+                    frame_rgb = cv2.cvtColor(frame_mirror, cv2.COLOR_BGR2RGB, dst=rgb_buf)
+                results = await loop.run_in_executor(inference_pool, pose.process, frame_rgb)
+                last_results = results
+                ref_signature = signature
+                skipped = 0
+
+            if results.pose_landmarks:
+                landmarks_arr = landmarks_to_array(results.pose_landmarks, out=lm_buf)
+                mid_hip_z, torso_angle = compute_kinematics(landmarks_arr)
+
+                # encode once per frame, so client writers only forward bytes:
+                # fixed header + int16 landmarks, ~300 bytes vs ~3 KB of JSON floats
+                publish(POSE_HEADER.pack(
+                    time.time(), w, h, mid_hip_z, torso_angle, fps,
+                    LANDMARK_SCALE, len(landmarks_arr),
+                ) + quantize_landmarks(landmarks_arr))
+
+            # debug drawing & display, only every DISPLAY_EVERY frames
+            show = not HEADLESS and frame_id % DISPLAY_EVERY == 0
+            frame_id += 1
+            if show:
+                debug_frame = frame_mirror.get() if USE_OPENCL else frame_mirror
                 if results.pose_landmarks:
                     mp_drawing.draw_landmarks(
                         debug_frame,
@@ -124,52 +386,51 @@ def camera_worker(last_payload: dict, stop_event: threading.Event, camera_index:
                             cv2.FONT_HERSHEY_SIMPLEX, 0.7, (255, 255, 255), 2)
                 cv2.imshow("MediaPipe Pose (websocket server)", debug_frame)
 
-                prev = time.time()
-
-                # small sleep to control loop roughly
-                elapsed = time.time() - t0
-                to_sleep = FRAME_DELAY - elapsed
-                if to_sleep > 0:
-                    time.sleep(to_sleep)
-
-                # Check key in the same thread (required for imshow to be responsive)
+                # Check key on the thread that owns the window (required for imshow to be responsive)
                 if cv2.waitKey(1) & 0xFF == ord('q'):
-                    stop_event.set()
                     break
-        finally:
-            cap.release()
+
+            # pace against absolute deadlines so the cadence doesn't drift
+            sleep_for = next_tick - time.perf_counter()
+            if sleep_for > 0:
+                await asyncio.sleep(sleep_for)
+                next_tick += FRAME_DELAY
+            else:
+                # still yield to the event loop, then resync instead of bursting to catch up
+                await asyncio.sleep(0)
+                next_tick = max(next_tick + FRAME_DELAY, time.perf_counter())
+    finally:
+        # Queue the releases behind any in-flight grab/process on their own threads
+        # and don't wait for them: a stalled driver must not block the event loop.
+        if pose is not None:
+            inference_pool.submit(pose.close)
+        if cap is not None:
+            capture_pool.submit(cap.release)
+        capture_pool.shutdown(wait=False)
+        inference_pool.shutdown(wait=False)
+        if not HEADLESS:
             cv2.destroyAllWindows()
-            stop_event.set()
-            print("[CAM] Camera worker stopped.")
-
-
-async def broadcast_loop(get_payload_fn, stop_event: threading.Event):
-    """Collect payloads and broadcast to connected websockets at TARGET_FPS."""
-    while not stop_event.is_set():
-        start = time.time()
-        payload = get_payload_fn()
-        if payload is None or payload.get("landmarks") is None:
-            # nothing to send currently
-            await asyncio.sleep(0.001)
-        else:
-            message = json.dumps(payload)
-            webs = list(CONNECTED)
-            if webs:
-                send_coros = []
-                for ws in webs:
-                    try:
-                        send_coros.append(ws.send(message))
-                    except Exception:
-                        pass
-                if send_coros:
-                    await asyncio.gather(*send_coros, return_exceptions=True)
-
-        elapsed = time.time() - start
-        to_sleep = FRAME_DELAY - elapsed
-        if to_sleep > 0:
-            await asyncio.sleep(to_sleep)
-        else:
-            await asyncio.sleep(0.001)
+        stop_event.set()
+        print("[CAM] Camera loop stopped.")
+
+
+async def client_writer(ws, queue: asyncio.Queue):
+    """
+    Long-lived per-client sender, so a slow socket only delays its own frames.
+    A client that fell behind gets only the newest frame, or with BATCH_FRAMES > 1
+    up to that many of the queued frames back to back in one message.
+    """
+    try:
+        while True:
+            frames = [await queue.get()]
+            while not queue.empty():
+                frames.append(queue.get_nowait())
+            # each frame carries its own header and landmark count, so they just concatenate
+            await ws.send(b"".join(frames[-BATCH_FRAMES:]))
+    except websockets.exceptions.ConnectionClosed:
+        # stop queueing frames for this client right away instead of waiting
+        # for ws_handler's read loop to notice the close
+        CONNECTED.pop(ws, None)
 
 
 async def ws_handler(ws):
@@ -182,7 +443,9 @@ async def ws_handler(ws):
     except Exception:
         print("[WS] Client connected (address unknown)")
 
-    CONNECTED.add(ws)
+    queue = asyncio.Queue(maxsize=CLIENT_QUEUE_SIZE)
+    CONNECTED[ws] = queue
+    writer = asyncio.create_task(client_writer(ws, queue))
     try:
         # keep the connection alive; if client sends messages we ignore them for now
         async for _ in ws:
@@ -192,21 +455,56 @@ async def ws_handler(ws):
     except Exception as e:
         print("[WS] Connection error:", e)
     finally:
-        CONNECTED.discard(ws)
+        CONNECTED.pop(ws, None)
+        writer.cancel()
         print(f"[WS] Client disconnected: {addr}")
 
 
-async def start_websocket_server(get_payload_fn, stop_event: threading.Event):
-    """Start websockets server and broadcasting task; wait until stop_event set."""
+def install_stop_signals(stop_event: asyncio.Event):
+    """
+    Make Ctrl+C / SIGTERM request a clean shutdown (the only way to quit when headless).
+    stop_event is set from a loop callback, never from inside the signal handler itself.
+    Returns a function that puts the previous handlers back; call it before the loop closes.
+    """
+    loop = asyncio.get_running_loop()
+    restorers = []
+
+    def request_stop(signum):
+        print(f"[MAIN] Received signal {signum}, stopping...")
+        stop_event.set()
+
+    for signum in (signal.SIGINT, signal.SIGTERM):
+        try:
+            loop.add_signal_handler(signum, request_stop, signum)
+            restorers.append(lambda signum=signum: loop.remove_signal_handler(signum))
+        except NotImplementedError:
+            # Windows event loops: plain handler that only schedules the callback
+            previous = signal.signal(signum, lambda sig, frame: loop.call_soon_threadsafe(request_stop, sig))
+            restorers.append(lambda signum=signum, previous=previous: signal.signal(signum, previous))
+
+    def restore():
+        for restorer in restorers:
+            restorer()
+
+    return restore
+
+
+async def start_websocket_server(camera_index: int = 0):
+    """
+    Start websockets server and the camera loop; wait until a stop is requested
+    ('q', SIGINT/SIGTERM, or the camera loop ending).
+    Returns False if the camera loop had to be abandoned on shutdown.
+    """
+    stop_event = asyncio.Event()
+    restore_signals = install_stop_signals(stop_event)
     server = await websockets.serve(ws_handler, WS_HOST, WS_PORT)
     print(f"[WS] Server listening on ws://{WS_HOST}:{WS_PORT}")
 
-    broadcaster = asyncio.create_task(broadcast_loop(get_payload_fn, stop_event))
+    camera = asyncio.create_task(camera_loop(stop_event, camera_index))
 
-    # Wait until stop_event is set (poll)
+    # Wait until stop_event is set ('q', signal, or the camera loop ending)
     try:
-        while not stop_event.is_set():
-            await asyncio.sleep(0.1)
+        await stop_event.wait()
     finally:
         # shutdown: close websockets and wait
         print("[WS] Shutting down server, closing clients...")
@@ -218,39 +516,37 @@ async def start_websocket_server(get_payload_fn, stop_event: threading.Event):
                 pass
         server.close()
         await server.wait_closed()
-        broadcaster.cancel()
+        # the camera loop sees stop_event within a frame and cleans up after itself;
+        # if it is stuck in a grab, cancel it rather than wait on the driver
+        camera_stopped = True
         try:
-            await broadcaster
-        except asyncio.CancelledError:
-            pass
+            await asyncio.wait_for(camera, CAMERA_STOP_TIMEOUT)
+        except asyncio.TimeoutError:
+            print(f"[CAM] Camera loop did not stop within {CAMERA_STOP_TIMEOUT}s, abandoning it.")
+            camera_stopped = False
+        except Exception as e:
+            print("[CAM] Camera loop error:", e)
+        restore_signals()
         print("[WS] Server stopped.")
+    return camera_stopped
 
 
 def main():
-    last_payload = {"timestamp": None, "landmarks": None}
-    stop_event = threading.Event()
-
-    # start camera thread
-    cam_thread = threading.Thread(target=camera_worker, args=(last_payload, stop_event, 0), daemon=True)
-    cam_thread.start()
-
-    # helper to get payload for broadcaster
-    def get_payload():
-        # return a shallow copy so async code doesn't mutate while sending
-        if last_payload["landmarks"] is None:
-            return None
-        return dict(last_payload)
-
-    # run websocket server in asyncio loop and wait for stop_event
+    # run websocket server and camera loop in one asyncio loop (uvloop when installed)
+    run = uvloop.run if uvloop is not None else asyncio.run
+    camera_stopped = True
     try:
-        asyncio.run(start_websocket_server(get_payload, stop_event))
+        camera_stopped = run(start_websocket_server(0))
     except KeyboardInterrupt:
-        stop_event.set()
+        pass
     finally:
-        stop_event.set()
-        # ensure camera thread ends
-        cam_thread.join(timeout=2)
         print("Exiting.")
+    if not camera_stopped:
+        # a capture thread is wedged in the driver; the interpreter would join it at exit.
+        # os._exit skips interpreter cleanup, so flush buffered output (e.g. when piped) first.
+        sys.stdout.flush()
+        sys.stderr.flush()
+        os._exit(1)
 
 
 if __name__ == "__main__":
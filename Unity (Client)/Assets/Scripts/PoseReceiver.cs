@@ -1,5 +1,6 @@
 using System;
 using System.Collections.Generic;
+using System.IO;
 using UnityEngine;
 using NativeWebSocket;
 
@@ -20,10 +21,48 @@ public class PosePayload
     public int image_w;
     public int image_h;
     public float mid_hip_z;
+    public float torso_angle;
     public float fps;
     public List<Landmark> landmarks;
 }
 
+// Binary wire format sent by pose_server.py (little-endian). A message holds
+// one frame, or several back to back when the server batches (POSE_BATCH_FRAMES):
+//   double timestamp, uint image_w, uint image_h, float mid_hip_z,
+//   float torso_angle, float fps, float landmark_scale, ushort count,
+//   then count * int16 [x, y, z, visibility], each value = q / landmark_scale.
+public static class PoseWire
+{
+    public static PosePayload Read(BinaryReader reader)
+    {
+        var pose = new PosePayload
+        {
+            timestamp = reader.ReadDouble(),
+            image_w = (int)reader.ReadUInt32(),
+            image_h = (int)reader.ReadUInt32(),
+            mid_hip_z = reader.ReadSingle(),
+            torso_angle = reader.ReadSingle(),
+            fps = reader.ReadSingle()
+        };
+        float inv = 1f / reader.ReadSingle();
+        int count = reader.ReadUInt16();
+
+        pose.landmarks = new List<Landmark>(count);
+        for (int i = 0; i < count; i++)
+        {
+            pose.landmarks.Add(new Landmark
+            {
+                id = i,
+                x = reader.ReadInt16() * inv,
+                y = reader.ReadInt16() * inv,
+                z = reader.ReadInt16() * inv,
+                visibility = reader.ReadInt16() * inv
+            });
+        }
+        return pose;
+    }
+}
+
 public class PoseReceiver : MonoBehaviour
 {
     private WebSocket websocket;
@@ -46,22 +85,16 @@ public class PoseReceiver : MonoBehaviour
         {
             try
             {
-                string message = System.Text.Encoding.UTF8.GetString(bytes);
-                PosePayload newPose = JsonUtility.FromJson<PosePayload>(message);
-                if (newPose?.landmarks != null && newPose.landmarks.Count > 0)
+                using (var reader = new BinaryReader(new MemoryStream(bytes)))
                 {
-                    // Smooth landmarks between frames
-                    if (smoothedPose == null)
-                        smoothedPose = newPose;
-                    else
-                        SmoothPose(smoothedPose, newPose);
-
-                    latestPose = smoothedPose;
+                    // oldest first, so smoothing sees batched frames in capture order
+                    while (reader.BaseStream.Position < reader.BaseStream.Length)
+                        ApplyPose(PoseWire.Read(reader));
                 }
             }
             catch (Exception ex)
             {
-                Debug.LogWarning("[WS] JSON parse error: " + ex.Message);
+                Debug.LogWarning("[WS] Pose parse error: " + ex.Message);
             }
         };
 
@@ -90,6 +123,20 @@ public class PoseReceiver : MonoBehaviour
         await websocket.Close();
     }
 
+    private void ApplyPose(PosePayload newPose)
+    {
+        if (newPose.landmarks.Count == 0)
+            return;
+
+        // Smooth landmarks between frames
+        if (smoothedPose == null)
+            smoothedPose = newPose;
+        else
+            SmoothPose(smoothedPose, newPose);
+
+        latestPose = smoothedPose;
+    }
+
     // Smooth pose landmarks by lerping each float coordinate
     private void SmoothPose(PosePayload smooth, PosePayload fresh)
     {
@@ -107,6 +154,7 @@ public class PoseReceiver : MonoBehaviour
         smooth.image_w = fresh.image_w;
         smooth.image_h = fresh.image_h;
         smooth.mid_hip_z = fresh.mid_hip_z;
+        smooth.torso_angle = fresh.torso_angle;
         smooth.fps = fresh.fps;
     }
 